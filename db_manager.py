@@ -1,16 +1,95 @@
+import queue
 import sqlite3
 import threading
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime
+from pathlib import Path
+
+_SCHEMA_SQL = """
+    BEGIN;
+    CREATE TABLE IF NOT EXISTS resources (
+        resource_name TEXT PRIMARY KEY,
+        total INTEGER NOT NULL,
+        available INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS orders (
+        order_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        priority INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS allocations (
+        order_id TEXT NOT NULL,
+        resource_name TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        PRIMARY KEY (order_id, resource_name),
+        FOREIGN KEY (order_id) REFERENCES orders(order_id),
+        FOREIGN KEY (resource_name) REFERENCES resources(resource_name)
+    );
+    CREATE TABLE IF NOT EXISTS logs (
+        timestamp TEXT NOT NULL,
+        event TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_logs_ts ON logs(timestamp DESC);
+    COMMIT;
+"""
+
+_UPSERT_RESOURCE_SQL = """
+    INSERT INTO resources (resource_name, total, available)
+    VALUES (?, ?, ?)
+    ON CONFLICT(resource_name) DO UPDATE SET
+        total=excluded.total,
+        available=excluded.available
+"""
+
+_UPSERT_ORDER_SQL = """
+    INSERT INTO orders (order_id, status, priority)
+    VALUES (?, ?, ?)
+    ON CONFLICT(order_id) DO UPDATE SET
+        status=excluded.status,
+        priority=excluded.priority
+"""
+
+_UPSERT_ALLOC_SQL = """
+    INSERT INTO allocations (order_id, resource_name, quantity)
+    VALUES (?, ?, ?)
+    ON CONFLICT(order_id, resource_name) DO UPDATE SET
+        quantity=excluded.quantity
+"""
 
 class DBManager:
     _instance = None
     _lock = threading.Lock()
+    READ_POOL_SIZE = 4
+    FETCH_SIZE = 1024
 
     def __init__(self, db_path="cloud_kitchen.db"):
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # Autocommit mode; writes are grouped explicitly with transaction()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
         self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA mmap_size=268435456")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self._cur = self.conn.cursor()  # reused by all mutators
+        self._tx_depth = 0
+        # Upsert rows buffered by defer(), keyed by statement; None when not deferring
+        self._deferred = None
+        # Results of get_resources/get_orders/get_allocations, reset by writes
+        self._cache_resources = None
+        self._cache_orders = None
+        self._cache_allocations = None
         self._create_tables()
+        # Pool of read-only connections for the get_* methods
+        self._ro_pool = queue.Queue()
+        ro_uri = Path(self.db_path).absolute().as_uri() + "?mode=ro"
+        for _ in range(self.READ_POOL_SIZE):
+            ro = sqlite3.connect(ro_uri, uri=True, check_same_thread=False)
+            ro.row_factory = sqlite3.Row
+            ro.execute("PRAGMA query_only=1")
+            self._ro_pool.put(ro)
 
     @classmethod
     def get_instance(cls):
@@ -19,115 +98,194 @@ class DBManager:
                 cls._instance = DBManager()
             return cls._instance
 
+    @contextmanager
+    def transaction(self):
+        """
+        Group writes into one transaction (one commit/fsync).
+        Nested use joins the outermost transaction.
+        """
+        if self._tx_depth == 0:
+            self.conn.execute("BEGIN")
+        self._tx_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self.conn.execute("ROLLBACK")
+                self._invalidate_caches()
+            raise
+        else:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self.conn.execute("COMMIT")
+
+    @contextmanager
+    def defer(self):
+        """
+        Buffer upserts and write them with one executemany per table on exit,
+        inside a single transaction. Deletes and reads flush the buffer first,
+        so statement order is preserved. Nested use joins the outer buffer.
+        """
+        if self._deferred is not None:
+            yield
+            return
+        self._deferred = {}
+        try:
+            with self.transaction():
+                yield
+                self._flush_deferred()
+        finally:
+            self._deferred = None
+
+    def _flush_deferred(self):
+        if self._deferred:
+            for sql, rows in self._deferred.items():
+                self._cur.executemany(sql, rows)
+            self._deferred.clear()
+
+    def _write(self, sql, row):
+        if self._deferred is None:
+            self._cur.execute(sql, row)
+        else:
+            self._deferred.setdefault(sql, []).append(row)
+
+    def _write_many(self, sql, rows):
+        if self._deferred is None:
+            with self.transaction():
+                self._cur.executemany(sql, rows)
+        else:
+            self._deferred.setdefault(sql, []).extend(rows)
+
+    def _invalidate_caches(self):
+        self._cache_resources = None
+        self._cache_orders = None
+        self._cache_allocations = None
+
+    @contextmanager
+    def _ro_conn(self):
+        """
+        Borrow a read-only connection from the pool.
+        Inside a transaction the writer connection is used instead, so reads
+        see the uncommitted writes of that transaction.
+        """
+        if self._tx_depth:
+            self._flush_deferred()
+            yield self.conn
+            return
+        conn = self._ro_pool.get()
+        try:
+            yield conn
+        finally:
+            self._ro_pool.put(conn)
+
     def _create_tables(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS resources (
-                resource_name TEXT PRIMARY KEY,
-                total INTEGER NOT NULL,
-                available INTEGER NOT NULL
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS orders (
-                order_id TEXT PRIMARY KEY,
-                status TEXT NOT NULL,
-                priority INTEGER NOT NULL
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS allocations (
-                order_id TEXT NOT NULL,
-                resource_name TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                PRIMARY KEY (order_id, resource_name),
-                FOREIGN KEY (order_id) REFERENCES orders(order_id),
-                FOREIGN KEY (resource_name) REFERENCES resources(resource_name)
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS logs (
-                timestamp TEXT NOT NULL,
-                event TEXT NOT NULL
-            )
-        """)
-        self.conn.commit()
+        self.conn.executescript(_SCHEMA_SQL)
 
     def get_resources(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT resource_name, total, available FROM resources")
-        rows = cursor.fetchall()
-        return {row["resource_name"]: {"total": row["total"], "available": row["available"]} for row in rows}
+        """
+        Cached until the next resource write; callers must not mutate the result.
+        """
+        if self._cache_resources is None:
+            with self._ro_conn() as conn:
+                rows = conn.execute("SELECT resource_name, total, available FROM resources").fetchall()
+            self._cache_resources = {row["resource_name"]: {"total": row["total"], "available": row["available"]}
+                                     for row in rows}
+        return self._cache_resources
 
     def upsert_resource(self, resource_name, total, available):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO resources (resource_name, total, available)
-            VALUES (?, ?, ?)
-            ON CONFLICT(resource_name) DO UPDATE SET
-                total=excluded.total,
-                available=excluded.available
-        """, (resource_name, total, available))
-        self.conn.commit()
+        self._cache_resources = None
+        self._write(_UPSERT_RESOURCE_SQL, (resource_name, total, available))
+
+    def upsert_resources_many(self, rows):
+        """
+        rows: iterable of (resource_name, total, available)
+        """
+        self._cache_resources = None
+        self._write_many(_UPSERT_RESOURCE_SQL, rows)
 
     def get_orders(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT order_id, status, priority FROM orders")
-        rows = cursor.fetchall()
-        return {row["order_id"]: {"status": row["status"], "priority": row["priority"]} for row in rows}
+        """
+        Cached until the next order write; callers must not mutate the result.
+        """
+        if self._cache_orders is None:
+            with self._ro_conn() as conn:
+                rows = conn.execute("SELECT order_id, status, priority FROM orders").fetchall()
+            self._cache_orders = {row["order_id"]: {"status": row["status"], "priority": row["priority"]}
+                                  for row in rows}
+        return self._cache_orders
 
     def upsert_order(self, order_id, status, priority):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO orders (order_id, status, priority)
-            VALUES (?, ?, ?)
-            ON CONFLICT(order_id) DO UPDATE SET
-                status=excluded.status,
-                priority=excluded.priority
-        """, (order_id, status, priority))
-        self.conn.commit()
+        self._cache_orders = None
+        self._write(_UPSERT_ORDER_SQL, (order_id, status, priority))
+
+    def upsert_orders_many(self, rows):
+        """
+        rows: iterable of (order_id, status, priority)
+        """
+        self._cache_orders = None
+        self._write_many(_UPSERT_ORDER_SQL, rows)
 
     def delete_order(self, order_id):
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM orders WHERE order_id = ?", (order_id,))
-        cursor.execute("DELETE FROM allocations WHERE order_id = ?", (order_id,))
-        self.conn.commit()
+        self._cache_orders = None
+        self._cache_allocations = None
+        with self.transaction():
+            self._flush_deferred()
+            self._cur.execute("DELETE FROM orders WHERE order_id = ?", (order_id,))
+            self._cur.execute("DELETE FROM allocations WHERE order_id = ?", (order_id,))
 
     def get_allocations(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT order_id, resource_name, quantity FROM allocations")
-        rows = cursor.fetchall()
-        allocations = {}
-        for row in rows:
-            allocations.setdefault(row["order_id"], {})[row["resource_name"]] = row["quantity"]
-        return allocations
+        """
+        Cached until the next allocation write; callers must not mutate the result.
+        """
+        if self._cache_allocations is None:
+            allocations = defaultdict(dict)
+            with self._ro_conn() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = None  # plain tuples, unpacked positionally
+                for order_id, resource_name, quantity in cursor.execute(
+                        "SELECT order_id, resource_name, quantity FROM allocations"):
+                    allocations[order_id][resource_name] = quantity
+            self._cache_allocations = dict(allocations)
+        return self._cache_allocations
 
     def upsert_allocation(self, order_id, resource_name, quantity):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO allocations (order_id, resource_name, quantity)
-            VALUES (?, ?, ?)
-            ON CONFLICT(order_id, resource_name) DO UPDATE SET
-                quantity=excluded.quantity
-        """, (order_id, resource_name, quantity))
-        self.conn.commit()
+        self._cache_allocations = None
+        self._write(_UPSERT_ALLOC_SQL, (order_id, resource_name, quantity))
+
+    def upsert_allocations_many(self, rows):
+        """
+        rows: iterable of (order_id, resource_name, quantity)
+        """
+        self._cache_allocations = None
+        self._write_many(_UPSERT_ALLOC_SQL, rows)
 
     def delete_allocations_for_order(self, order_id):
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM allocations WHERE order_id = ?", (order_id,))
-        self.conn.commit()
+        self._cache_allocations = None
+        self._flush_deferred()
+        self._cur.execute("DELETE FROM allocations WHERE order_id = ?", (order_id,))
 
     def log_event(self, event):
-        cursor = self.conn.cursor()
-        timestamp = datetime.now().isoformat()
-        cursor.execute("INSERT INTO logs (timestamp, event) VALUES (?, ?)", (timestamp, event))
-        self.conn.commit()
+        """
+        Insert one log row. Synchronous on purpose: nothing in the app calls
+        this (the GUI log is a widget), so it does not warrant a writer thread.
+        """
+        self._write("INSERT INTO logs (timestamp, event) VALUES (?, ?)", (datetime.now().isoformat(), event))
 
     def get_logs(self, limit=100):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT timestamp, event FROM logs ORDER BY timestamp DESC LIMIT ?", (limit,))
-        rows = cursor.fetchall()
-        return [{"timestamp": row["timestamp"], "event": row["event"]} for row in rows]
+        logs = []
+        with self._ro_conn() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("SELECT timestamp, event FROM logs ORDER BY timestamp DESC LIMIT ?", (limit,))
+            while True:
+                rows = cursor.fetchmany(self.FETCH_SIZE)
+                if not rows:
+                    break
+                logs.extend({"timestamp": timestamp, "event": event} for timestamp, event in rows)
+        return logs
 
     def close(self):
+        while not self._ro_pool.empty():
+            self._ro_pool.get_nowait().close()
         self.conn.close()
@@ -4,6 +4,28 @@ deadlock_detector.py
 Module to implement deadlock detection algorithms.
 """
 
+from operator import le
+
+class _Index:
+    """
+    Dense integer ids for a collection of keys (order_ids or resource names).
+    """
+    def __init__(self, keys=()):
+        self.ids = []  # int -> key
+        self.idx = {}  # key -> int
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        i = self.idx.get(key)
+        if i is None:
+            i = self.idx[key] = len(self.ids)
+            self.ids.append(key)
+        return i
+
+    def __len__(self):
+        return len(self.ids)
+
 class DeadlockDetector:
     def __init__(self, resource_manager):
         """
@@ -19,61 +41,182 @@ class DeadlockDetector:
         """
         wfg = {}
         allocations = self.rm.allocated_resources
+        holders = self.rm.holders_by_resource()
 
         # Include all orders holding resources and requesting resources
-        all_orders = set(allocations.keys()) | set(requests.keys())
+        all_orders = allocations.keys() | requests.keys()
 
         for order_id in all_orders:
             wfg[order_id] = set()
 
         for order_id, req in requests.items():
-            for res, qty in req.items():
-                for holder_id, alloc in allocations.items():
-                    if holder_id != order_id and alloc.get(res, 0) > 0:
+            waits_for = wfg[order_id]
+            for res in req:
+                for holder_id in holders.get(res, ()):
+                    if holder_id != order_id:
                         # If requested resource is held by another order, add edge
-                        wfg[order_id].add(holder_id)
+                        waits_for.add(holder_id)
         return wfg
 
+    def build_wait_for_bits(self, requests):
+        """
+        Build the Wait-for Graph as int bitmasks over dense order ids.
+        requests: dict of order_id -> requested resources (dict)
+        Returns: (order _Index, list of int) where bit k of adj[i] means
+        order i waits for order k
+        """
+        holders = self.rm.holders_by_resource()
+        orders = _Index(self.rm.allocated_resources)
+        for order_id in requests:
+            orders.add(order_id)
+        idx = orders.idx
+        holder_bits = {res: sum(1 << idx[h] for h in hs) for res, hs in holders.items()}
+
+        adj = [0] * len(orders)
+        for order_id, req in requests.items():
+            i = idx[order_id]
+            mask = 0
+            for res in req:
+                mask |= holder_bits.get(res, 0)
+            adj[i] = mask & ~(1 << i)
+        return orders, adj
+
+    @staticmethod
+    def _wfg_to_bits(wfg):
+        """
+        Convert a dict Wait-for Graph to (order _Index, bitmask adjacency).
+        """
+        orders = _Index(wfg)
+        for targets in wfg.values():
+            for order_id in targets:
+                orders.add(order_id)
+        idx = orders.idx
+        adj = [0] * len(orders)
+        for order_id, targets in wfg.items():
+            adj[idx[order_id]] = sum(1 << idx[t] for t in set(targets))
+        return orders, adj
+
     def detect_deadlocks(self, wfg):
         """
         Detect cycles in the Wait-for Graph.
-        Returns list of sets, each set is a cycle (deadlock group).
-        """
-        visited = set()
-        stack = set()
-        deadlocks = []
-
-        def dfs(node, path):
-            visited.add(node)
-            stack.add(node)
-            path.append(node)
-            for neighbor in wfg.get(node, []):
-                if neighbor not in visited:
-                    if dfs(neighbor, path):
-                        return True
-                elif neighbor in stack:
-                    # Cycle detected
-                    cycle_start = path.index(neighbor)
-                    deadlocks.append(set(path[cycle_start:]))
-                    return True
-            stack.remove(node)
-            path.pop()
-            return False
-
-        for node in wfg:
-            if node not in visited:
-                dfs(node, [])
-
-        return deadlocks
+        wfg: dict of order_id -> set of order_ids it is waiting for
+        Returns list of sets, each set is a deadlock group: the orders of
+        one strongly connected component of the graph.
+        """
+        orders, adj = self._wfg_to_bits(wfg)
+        return self._cycles_to_ids(orders, self._find_cycles(adj))
+
+    def _find_cycles(self, adj):
+        """
+        Iterative Tarjan SCC over bitmask adjacency lists.
+        Every strongly connected component with more than one node, or a
+        single node waiting on itself, is one deadlock group.
+        Returns list of groups, each an int bitmask of node ids.
+        """
+        n = len(adj)
+        visited = bytearray(n)
+        on_stack = bytearray(n)
+        index = [0] * n
+        lowlink = [0] * n
+        scc_stack = []
+        counter = 0
+        sccs = []
+
+        for root in range(n):
+            if visited[root]:
+                continue
+            visited[root] = on_stack[root] = 1
+            index[root] = lowlink[root] = counter
+            counter += 1
+            scc_stack.append(root)
+            # Each frame holds a node and its not-yet-explored successors,
+            # so every edge is looked at exactly once
+            stack = [[root, adj[root]]]
+            while stack:
+                frame = stack[-1]
+                node, pending = frame
+                if pending:
+                    low = pending & -pending
+                    frame[1] = pending ^ low
+                    neighbor = low.bit_length() - 1
+                    if not visited[neighbor]:
+                        visited[neighbor] = on_stack[neighbor] = 1
+                        index[neighbor] = lowlink[neighbor] = counter
+                        counter += 1
+                        scc_stack.append(neighbor)
+                        stack.append([neighbor, adj[neighbor]])
+                    elif on_stack[neighbor] and index[neighbor] < lowlink[node]:
+                        lowlink[node] = index[neighbor]
+                    continue
+
+                stack.pop()
+                if stack:
+                    caller = stack[-1][0]
+                    if lowlink[node] < lowlink[caller]:
+                        lowlink[caller] = lowlink[node]
+                if lowlink[node] == index[node]:
+                    # node is the root of an SCC: pop its members
+                    mask = 0
+                    while True:
+                        member = scc_stack.pop()
+                        on_stack[member] = 0
+                        mask |= 1 << member
+                        if member == node:
+                            break
+                    if mask != 1 << node or adj[node] >> node & 1:
+                        sccs.append(mask)
+
+        return sccs
+
+    @staticmethod
+    def _cycles_to_ids(index, cycles):
+        """
+        Convert bitmask cycles back to sets of keys.
+        """
+        result = []
+        for mask in cycles:
+            members = set()
+            while mask:
+                low = mask & -mask
+                members.add(index.ids[low.bit_length() - 1])
+                mask ^= low
+            result.append(members)
+        return result
 
     def detect(self, requests):
         """
         Detect deadlocks given current requests.
         Returns list of deadlock cycles.
         """
-        wfg = self.build_wait_for_graph(requests)
-        deadlocks = self.detect_deadlocks(wfg)
-        return deadlocks
+        # A wait-for edge needs both a waiting request and a holder
+        if not requests or not self.rm.allocated_resources:
+            return []
+        orders, adj = self.build_wait_for_bits(requests)
+        return self._cycles_to_ids(orders, self._find_cycles(adj))
+
+    @staticmethod
+    def _to_arrays(max_demand, allocation, available):
+        """
+        Lay out Banker's inputs as dense rows over a shared resource index.
+        Returns (need_rows, alloc_rows, work): one row per order in
+        max_demand order, one column per resource.
+        """
+        resources = _Index(available)
+        for order_id, demand in max_demand.items():
+            for res in demand:
+                resources.add(res)
+            for res in allocation.get(order_id, {}):
+                resources.add(res)
+
+        res_ids = resources.ids
+        alloc_rows = []
+        need_rows = []
+        for order_id, demand in max_demand.items():
+            alloc = allocation.get(order_id, {})
+            alloc_rows.append([alloc.get(res, 0) for res in res_ids])
+            need_rows.append([demand[res] - alloc.get(res, 0) if res in demand else 0 for res in res_ids])
+        work = [available.get(res, 0) for res in res_ids]
+        return need_rows, alloc_rows, work
 
     def bankers_algorithm(self, max_demand, allocation, available):
         """
@@ -83,19 +226,15 @@ class DeadlockDetector:
         available: dict of resource_name -> available quantity
         Returns True if system is in safe state, False otherwise.
         """
-        work = available.copy()
-        finish = {order: False for order in max_demand}
-        while True:
-            progress = False
-            for order, need in max_demand.items():
-                if not finish[order]:
-                    # Calculate need = max_demand - allocation
-                    need_res = {res: need.get(res, 0) - allocation.get(order, {}).get(res, 0) for res in need}
-                    if all(need_res[res] <= work.get(res, 0) for res in need_res):
-                        for res in allocation.get(order, {}):
-                            work[res] = work.get(res, 0) + allocation[order].get(res, 0)
-                        finish[order] = True
-                        progress = True
-            if not progress:
-                break
-        return all(finish.values())
+        need_rows, alloc_rows, work = self._to_arrays(max_demand, allocation, available)
+        unfinished = range(len(need_rows))
+        while unfinished:
+            # Every order whose whole need fits in work can finish this pass
+            runnable, blocked = [], []
+            for i in unfinished:
+                (runnable if all(map(le, need_rows[i], work)) else blocked).append(i)
+            if not runnable:
+                return False
+            work = list(map(sum, zip(work, *(alloc_rows[i] for i in runnable))))
+            unfinished = blocked
+        return True
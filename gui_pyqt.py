@@ -9,7 +9,7 @@ import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QTreeWidget, QTreeWidgetItem, QTextEdit,
                              QInputDialog, QMessageBox, QFileDialog)
-from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal
 import networkx as nx
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
@@ -22,13 +22,36 @@ class RAGCanvas(FigureCanvas):
         self.fig, self.ax = plt.subplots(figsize=(5,5))
         super().__init__(self.fig)
         self.setParent(parent)
-
-    def draw_rag(self, resource_manager, order_manager, deadlocks):
-        self.ax.clear()
+        # State of the last full redraw, reused by incremental updates
+        self._topology = (frozenset(), frozenset())
+        self._edge_labels = {}
+        self._pos = {}
+        self._nodelist = []
+        self._node_colors = []
+        self._node_artist = None
+        self._label_artists = []
+        self._bg = None
+        self.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        # Node and label artists are animated, so the cached background
+        # holds everything else and they are painted on top of it
+        self._bg = self.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        if self._node_artist is not None:
+            self.ax.draw_artist(self._node_artist)
+        for text in self._label_artists:
+            self.ax.draw_artist(text)
+
+    def draw_rag(self, resource_manager, active_orders, requests, deadlocked):
         G = nx.DiGraph()
 
         # Add nodes for orders and resources
-        for order_id in list(order_manager.get_active_orders().keys()) + list(order_manager.get_current_requests().keys()):
+        for order_id in active_orders:
+            G.add_node(order_id, type='order')
+        for order_id in requests:
             G.add_node(order_id, type='order')
         for res in resource_manager.total_resources.keys():
             G.add_node(res, type='resource')
@@ -41,29 +64,85 @@ class RAGCanvas(FigureCanvas):
                     G.add_edge(res, order_id, label=str(qty))
 
         # Add edges for requests (order -> resource)
-        requests = order_manager.get_current_requests()
         for order_id, res_dict in requests.items():
             for res, qty in res_dict.items():
                 if qty > 0:
                     G.add_edge(order_id, res, label=str(qty))
 
+        edge_labels = nx.get_edge_attributes(G, 'label')
+        topology = (frozenset(G.nodes()), frozenset(G.edges()))
+        same_topology = topology == self._topology
+        if same_topology and edge_labels == self._edge_labels:
+            self._recolor(self._node_colors_for(G, self._nodelist, deadlocked))
+        else:
+            nodelist = list(G.nodes())
+            self._redraw(G, nodelist, edge_labels, self._node_colors_for(G, nodelist, deadlocked),
+                         relayout=not same_topology)
+            self._topology = topology
+
+    def _node_colors_for(self, G, nodelist, deadlocked):
         # Color nodes: red for deadlocked orders, green for safe resources/orders
         node_colors = []
-        deadlocked_orders = set(o for cycle in deadlocks for o in cycle)
-        for node in G.nodes():
-            if node in deadlocked_orders:
+        for node in nodelist:
+            if node in deadlocked:
                 node_colors.append('red' if G.nodes[node].get('type') == 'order' else 'orange')
             else:
                 node_colors.append('lightgreen' if G.nodes[node].get('type') == 'order' else 'lightblue')
+        return node_colors
+
+    def _redraw(self, G, nodelist, edge_labels, node_colors, relayout):
+        """
+        Full redraw; the layout is only recomputed when the topology changed,
+        warm-started from the previous node positions.
+        """
+        if relayout:
+            init_pos = {node: xy for node, xy in self._pos.items() if node in G}
+            if init_pos:
+                # Warm start: a few iterations from the previous layout suffice
+                self._pos = nx.spring_layout(G, pos=init_pos, iterations=5, seed=0)
+            else:
+                self._pos = nx.spring_layout(G, seed=0)
+        self._edge_labels = edge_labels
+        self._nodelist = nodelist
+        self._node_colors = node_colors
 
-        pos = nx.spring_layout(G)
-        nx.draw(G, pos, ax=self.ax, with_labels=True, node_color=node_colors,
-                node_size=1500, font_size=10, font_weight='bold', arrowsize=20)
-        edge_labels = nx.get_edge_attributes(G, 'label')
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, ax=self.ax, font_color='blue')
+        self.ax.clear()
+        self.ax.set_axis_off()
+        if not self._nodelist:
+            self._node_artist = None
+            self._label_artists = []
+            self.draw()
+            return
+        nx.draw_networkx_edges(G, self._pos, ax=self.ax, node_size=1500, arrowsize=20)
+        self._node_artist = nx.draw_networkx_nodes(G, self._pos, nodelist=nodelist, ax=self.ax,
+                                                   node_color=node_colors, node_size=1500)
+        labels = nx.draw_networkx_labels(G, self._pos, ax=self.ax, font_size=10, font_weight='bold')
+        self._label_artists = list(labels.values())
+        nx.draw_networkx_edge_labels(G, self._pos, edge_labels=edge_labels, ax=self.ax, font_color='blue')
+        self._node_artist.set_animated(True)
+        for text in self._label_artists:
+            text.set_animated(True)
         self.draw()
 
+    def _recolor(self, node_colors):
+        """
+        Update node colors in place and blit only the animated artists.
+        """
+        if self._node_artist is None or node_colors == self._node_colors:
+            return
+        self._node_colors = node_colors
+        self._node_artist.set_facecolor(node_colors)
+        if self._bg is None:
+            self.draw()
+            return
+        self.restore_region(self._bg)
+        self._draw_animated()
+        self.blit(self.fig.bbox)
+
 class MainWindow(QMainWindow):
+    # Emitted by every action that changes orders or resources
+    state_changed = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Cloud Kitchen Deadlock Simulator")
@@ -82,6 +161,15 @@ class MainWindow(QMainWindow):
 
         self.order_counter = 1
         self.simulation_running = False
+        self._dirty = True  # set by mutators, cleared by update_status
+        self._deadlocks = []  # deadlocks found by the last update_status
+
+        # Coalesce bursts of state changes into one refresh
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(50)
+        self._refresh_timer.timeout.connect(self.update_status)
+        self.state_changed.connect(self._refresh_timer.start)
 
         self.init_ui()
         self.update_status()
@@ -190,7 +278,16 @@ class MainWindow(QMainWindow):
 
         main_layout.addLayout(right_panel, 4)
 
+    def mark_dirty(self):
+        self._dirty = True
+        self.state_changed.emit()
+
     def update_status(self):
+        # Nothing changed since the last refresh
+        if not self._dirty:
+            return
+        self._dirty = False
+
         # Update resource tree
         self.resource_tree.clear()
         status = self.resource_manager.get_status()
@@ -205,7 +302,8 @@ class MainWindow(QMainWindow):
         pending_requests = self.order_manager.get_current_requests()
 
         deadlocks = self.deadlock_detector.detect(pending_requests)
-        deadlocked_orders = set(o for cycle in deadlocks for o in cycle)
+        self._deadlocks = deadlocks
+        deadlocked_orders = frozenset().union(*deadlocks) if deadlocks else frozenset()
 
         for order_id, resources in active_orders.items():
             res_str = ", ".join(f"{k}:{v}" for k, v in resources.items())
@@ -227,7 +325,7 @@ class MainWindow(QMainWindow):
                 item.setBackground(2, Qt.red)
             self.orders_tree.addTopLevelItem(item)
 
-        self.rag_canvas.draw_rag(self.resource_manager, self.order_manager, deadlocks)
+        self.rag_canvas.draw_rag(self.resource_manager, active_orders, pending_requests, deadlocked=deadlocked_orders)
         self.update_explanation(deadlocks)
         self.update_log(f"Status updated. Deadlocks detected: {len(deadlocks)}")
 
@@ -265,12 +363,12 @@ class MainWindow(QMainWindow):
         self.order_manager.create_order(order_id, resource_request)
         self.order_manager.process_orders()
         self.order_counter += 1
-        self.update_status()
+        self.mark_dirty()
         self.update_log(f"Order {order_id} added with resources {resource_request}")
 
     def detect_deadlocks(self):
-        requests = self.order_manager.get_current_requests()
-        deadlocks = self.deadlock_detector.detect(requests)
+        self.update_status()
+        deadlocks = self._deadlocks
         if deadlocks:
             msg = "Deadlock detected among orders:\n"
             for cycle in deadlocks:
@@ -280,17 +378,17 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.information(self, "No Deadlock", "No deadlocks detected.")
             self.update_log("No deadlocks detected.")
-        self.update_status()
 
     def check_safe_state(self):
         max_demand = {}
         allocation = self.resource_manager.allocated_resources
         available = self.resource_manager.available_resources
-        for order_id in set(list(allocation.keys()) + list(self.order_manager.get_current_requests().keys())):
+        requests = self.order_manager.get_current_requests()
+        for order_id in allocation.keys() | requests.keys():
             max_demand[order_id] = {}
             alloc = allocation.get(order_id, {})
-            req = self.order_manager.get_current_requests().get(order_id, {})
-            for res in set(list(alloc.keys()) + list(req.keys())):
+            req = requests.get(order_id, {})
+            for res in alloc.keys() | req.keys():
                 max_demand[order_id][res] = max(alloc.get(res, 0), req.get(res, 0))
         safe = self.deadlock_detector.bankers_algorithm(max_demand, allocation, available)
         if safe:
@@ -310,7 +408,7 @@ class MainWindow(QMainWindow):
             order_id = item.text(0)
             self.order_manager.release_order(order_id)
             self.update_log(f"Order {order_id} released.")
-        self.update_status()
+        self.mark_dirty()
 
     def abort_order(self):
         selected_items = self.orders_tree.selectedItems()
@@ -321,7 +419,7 @@ class MainWindow(QMainWindow):
             order_id = item.text(0)
             self.order_manager.release_order(order_id)
             self.update_log(f"Order {order_id} aborted.")
-        self.update_status()
+        self.mark_dirty()
 
     def add_virtual_resources(self):
         additions = {}
@@ -337,7 +435,7 @@ class MainWindow(QMainWindow):
             return
         self.resource_manager.add_virtual_resources(additions)
         self.update_log(f"Virtual resources added: {additions}")
-        self.update_status()
+        self.mark_dirty()
 
     def preempt_resources(self):
         selected_items = self.orders_tree.selectedItems()
@@ -349,7 +447,7 @@ class MainWindow(QMainWindow):
             self.resource_manager.preempt_resources(order_id)
             self.order_manager.release_order(order_id)
             self.update_log(f"Resources preempted from order {order_id}. Order aborted.")
-        self.update_status()
+        self.mark_dirty()
 
     def play_simulation(self):
         if self.simulation_running:
@@ -373,14 +471,11 @@ class MainWindow(QMainWindow):
     def reset_simulation(self):
         self.simulation_running = False
         self.timer.stop()
-        self.order_manager.orders.clear()
-        self.order_manager.pending_requests.clear()
-        self.order_manager.order_priorities.clear()
-        self.resource_manager.available_resources = self.resource_manager.total_resources.copy()
-        self.resource_manager.allocated_resources.clear()
+        self.order_manager.reset()
+        self.resource_manager.reset()
         self.order_counter = 1
         self.update_log("Simulation reset.")
-        self.update_status()
+        self.mark_dirty()
 
     def simulation_step(self):
         # Add random order with random resource requests
@@ -394,11 +489,12 @@ class MainWindow(QMainWindow):
                 resource_request[res] = qty
         if resource_request:
             order_id = f"Order{self.order_counter}"
-            self.order_manager.create_order(order_id, resource_request)
-            self.order_manager.process_orders()
+            with self.order_manager.db.transaction():
+                self.order_manager.create_order(order_id, resource_request)
+                self.order_manager.process_orders()
             self.update_log(f"Simulation: Added {order_id} with resources {resource_request}")
             self.order_counter += 1
-            self.update_status()
+            self.mark_dirty()
 
     def quiz_mode(self):
         questions = [
@@ -4,10 +4,57 @@ order_manager.py
 Module to simulate orders and resource requests dynamically.
 """
 
+import heapq
+import itertools
 import random
+import sys
+from collections.abc import Mapping
+from dataclasses import dataclass
 
 from db_manager import DBManager
 
+# Order states; _STATUS maps each to its status string in the orders table
+PENDING = 0
+ALLOCATED = 1
+_STATUS = ("pending", "allocated")
+_STATE_BY_STATUS = {status: state for state, status in enumerate(_STATUS)}
+
+@dataclass(slots=True)
+class OrderRecord:
+    """
+    Everything known about one order. request holds the requested resources
+    while pending and the allocated ones once allocated.
+    """
+    state: int
+    priority: int
+    request: dict
+    created: int  # creation order, breaks ties between equal priorities
+    token: int = -1  # token of the live heap entry while pending, else -1
+
+class _StateView(Mapping):
+    """
+    Read-only live view of order_id -> request over the records in one state.
+    """
+    __slots__ = ("_records", "_state")
+
+    def __init__(self, records, state):
+        self._records = records
+        self._state = state
+
+    def __getitem__(self, order_id):
+        record = self._records[order_id]
+        if record.state != self._state:
+            raise KeyError(order_id)
+        return record.request
+
+    def __iter__(self):
+        state = self._state
+        return (order_id for order_id, record in self._records.items() if record.state == state)
+
+    def __len__(self):
+        state = self._state
+        return sum(record.state == state for record in self._records.values())
+
 class OrderManager:
     def __init__(self, resource_manager):
         """
@@ -16,32 +63,59 @@ class OrderManager:
         """
         self.rm = resource_manager
         self.db = DBManager.get_instance()
-        self.orders = {}  # order_id -> current allocated resources
-        self.pending_requests = {}  # order_id -> requested resources
-        self.order_priorities = {}  # order_id -> priority (lower number = higher priority)
-        self.holding_orders = set()  # orders currently holding resources but waiting
+        self._records = {}  # order_id -> OrderRecord
+        self.orders = _StateView(self._records, ALLOCATED)  # order_id -> current allocated resources
+        self.pending_requests = _StateView(self._records, PENDING)  # order_id -> requested resources
+        # Pending orders by priority (lower number = higher priority), then
+        # creation order: (priority, created, token, order_id). Entries whose
+        # token no longer matches the record are stale and skipped.
+        self._pending_heap = []
+        self._stale = 0  # stale entries still in _pending_heap
+        self._seq = itertools.count()  # source of both created and token values
 
         # Load orders from DB
         db_orders = self.db.get_orders()
         db_allocations = self.db.get_allocations()
 
         for order_id, data in db_orders.items():
-            status = data["status"]
-            priority = data["priority"]
-            self.order_priorities[order_id] = priority
-            if status == "allocated":
-                alloc = db_allocations.get(order_id, {})
-                self.orders[order_id] = alloc
-            elif status == "pending":
-                # For pending, load requested resources from allocations or empty
-                self.pending_requests[order_id] = db_allocations.get(order_id, {})
+            state = _STATE_BY_STATUS.get(data["status"])
+            if state is None:
+                continue
+            alloc = {sys.intern(res): qty for res, qty in db_allocations.get(order_id, {}).items()}
+            # For pending, load requested resources from allocations or empty
+            record = self._records[order_id] = OrderRecord(state, data["priority"], alloc, next(self._seq))
+            if state == PENDING:
+                self._push_pending(order_id, record)
+
+    def _push_pending(self, order_id, record):
+        record.token = token = next(self._seq)
+        heapq.heappush(self._pending_heap, (record.priority, record.created, token, order_id))
+
+    def _is_live(self, entry):
+        record = self._records.get(entry[3])
+        return record is not None and record.token == entry[2]
 
     def create_order(self, order_id, resource_request, priority=5):
         """
         Create a new order with a resource request and priority.
-        """
-        self.pending_requests[order_id] = resource_request
-        self.order_priorities[order_id] = priority
+        Only resources with a positive quantity are kept.
+        """
+        # Own a compact copy: process_orders hands it to the allocator as is.
+        # Largest share of a resource's total first, so a request that does
+        # not fit fails on its first check.
+        total = self.rm.total_resources
+        items = sorted((item for item in resource_request.items() if item[1] > 0),
+                       key=lambda item: -item[1] / max(1, total.get(item[0], 1)))
+        request = {sys.intern(res): qty for res, qty in items}
+        previous = self._records.get(order_id)
+        # Replacing a pending order keeps its place among equal priorities
+        if previous is not None and previous.state == PENDING:
+            created = previous.created
+            self._stale += 1
+        else:
+            created = next(self._seq)
+        record = self._records[order_id] = OrderRecord(PENDING, priority, request, created)
+        self._push_pending(order_id, record)
         self.db.upsert_order(order_id, "pending", priority)
 
     def process_orders(self):
@@ -49,44 +123,76 @@ class OrderManager:
         Try to allocate resources for pending requests based on priority.
         Simulate holding resources partially to create deadlock.
         """
-        to_remove = []
-        # Sort pending requests by priority (lower number first)
-        sorted_requests = sorted(self.pending_requests.items(), key=lambda x: self.order_priorities.get(x[0], 5))
-        for order_id, request in sorted_requests:
-            # Simulate allocation: allocate all requested resources but do not release until explicitly done
-            if self.rm._can_allocate(request):
-                self.rm._allocate(order_id, request)
-                self.orders[order_id] = request
-                self.db.upsert_order(order_id, "allocated", self.order_priorities[order_id])
-                to_remove.append(order_id)
-            else:
-                # Cannot allocate resources now, keep pending
-                pass
-        for order_id in to_remove:
-            if order_id in self.pending_requests:
-                del self.pending_requests[order_id]
+        with self.db.defer():
+            self._process_orders()
+
+    def _process_orders(self):
+        heap = self._pending_heap
+        records = self._records
+        if self._stale > len(heap) // 2:
+            # Mostly stale entries: rebuild the heap from the live ones
+            heap[:] = [entry for entry in heap if self._is_live(entry)]
+            heapq.heapify(heap)
+            self._stale = 0
+        # Availability only shrinks during this pass, so an order that does
+        # not fit now cannot fit later in the pass either
+        feasible = self.rm.feasible(self.pending_requests)
+        if not feasible:
+            return
+        left = len(feasible)
+        retry = []
+        allocated_rows = []  # order status rows, written in one batch
+        # Pop pending requests by priority (lower number first) until every
+        # feasible order was tried; later entries stay in the heap untouched
+        while left and heap:
+            entry = heapq.heappop(heap)
+            priority, created, token, order_id = entry
+            record = records.get(order_id)
+            if record is None or record.token != token:
+                self._stale -= 1
+                continue
+            if order_id in feasible:
+                left -= 1
+                # Simulate allocation: allocate all requested resources but do not release until explicitly done
+                # The order becomes allocated below, so hand its request over as is
+                if self.rm._try_allocate(order_id, record.request, take_ownership=True):
+                    record.state = ALLOCATED
+                    record.token = -1
+                    allocated_rows.append((order_id, "allocated", priority))
+                    continue
+            # Cannot allocate resources now, keep pending
+            retry.append(entry)
+        for entry in retry:
+            heapq.heappush(heap, entry)
+        if allocated_rows:
+            self.db.upsert_orders_many(allocated_rows)
 
     def release_order(self, order_id):
         """
         Release resources held by an order and remove it.
         """
-        self.rm.release_resources(order_id)
-        if order_id in self.orders:
-            del self.orders[order_id]
-        if order_id in self.pending_requests:
-            del self.pending_requests[order_id]
-        if order_id in self.order_priorities:
-            del self.order_priorities[order_id]
-        self.db.delete_order(order_id)
+        with self.db.transaction():
+            self.rm.release_resources(order_id)
+            self.db.delete_order(order_id)
+        record = self._records.pop(order_id, None)
+        if record is not None and record.state == PENDING:
+            # Its heap entry is now stale
+            self._stale += 1
 
     def reschedule_order(self, order_id, new_priority):
         """
         Change the priority of an order.
         """
-        if order_id in self.order_priorities:
-            self.order_priorities[order_id] = new_priority
-            status = "allocated" if order_id in self.orders else "pending"
-            self.db.upsert_order(order_id, status, new_priority)
+        record = self._records.get(order_id)
+        if record is not None:
+            if record.priority == new_priority:
+                return
+            record.priority = new_priority
+            if record.state == PENDING:
+                # The old heap entry becomes stale
+                self._stale += 1
+                self._push_pending(order_id, record)
+            self.db.upsert_order(order_id, _STATUS[record.state], new_priority)
 
     def cancel_order(self, order_id):
         """
@@ -94,14 +200,23 @@ class OrderManager:
         """
         self.release_order(order_id)
 
+    def reset(self):
+        """
+        Forget all orders in memory; the orders table is left as is.
+        """
+        self._records.clear()
+        self._pending_heap.clear()
+        self._stale = 0
+
     def get_current_requests(self):
         """
-        Return current pending requests.
+        Return a read-only live view of current pending requests.
+        Copy it if it must survive later order changes.
         """
-        return self.pending_requests.copy()
+        return self.pending_requests
 
     def get_active_orders(self):
         """
-        Return currently allocated orders.
+        Return a read-only live view of currently allocated orders.
         """
-        return self.orders.copy()
+        return self.orders
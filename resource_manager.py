@@ -4,6 +4,9 @@ resource_manager.py
 Module to manage kitchen resources and allocation.
 """
 
+import sys
+from collections import defaultdict
+
 from db_manager import DBManager
 
 class ResourceManager:
@@ -17,15 +20,16 @@ class ResourceManager:
         if resources is None:
             # Load resources from DB
             db_resources = self.db.get_resources()
-            self.total_resources = {res: db_resources[res]["total"] for res in db_resources}
-            self.available_resources = {res: db_resources[res]["available"] for res in db_resources}
+            self.total_resources = {sys.intern(res): db_resources[res]["total"] for res in db_resources}
+            self.available_resources = {sys.intern(res): db_resources[res]["available"] for res in db_resources}
         else:
-            self.total_resources = resources.copy()
-            self.available_resources = resources.copy()
+            # Interned names let dict lookups match by identity
+            self.total_resources = {sys.intern(res): qty for res, qty in resources.items()}
+            self.available_resources = self.total_resources.copy()
             # Save initial resources to DB
-            for res, qty in resources.items():
-                self.db.upsert_resource(res, qty, qty)
+            self.db.upsert_resources_many((res, qty, qty) for res, qty in resources.items())
         self.allocated_resources = {}  # order_id -> {resource_name: quantity}
+        self._by_resource = defaultdict(set)  # resource_name -> order_ids holding it
 
     def request_resources(self, order_id, request):
         """
@@ -33,67 +37,114 @@ class ResourceManager:
         request: dict of resource_name -> quantity
         Returns True if resources allocated, False otherwise.
         """
-        if self._can_allocate(request):
-            self._allocate(order_id, request)
-            return True
-        return False
+        return self._try_allocate(order_id, request)
 
     def release_resources(self, order_id):
         """
         Release all resources held by an order.
         """
         if order_id in self.allocated_resources:
-            for res, qty in self.allocated_resources[order_id].items():
-                self.available_resources[res] += qty
-            del self.allocated_resources[order_id]
-            # Update DB allocations and resources
-            self.db.delete_allocations_for_order(order_id)
-            for res in self.total_resources:
-                self.db.upsert_resource(res, self.total_resources[res], self.available_resources[res])
+            released = self.allocated_resources.pop(order_id)
+            avail = self.available_resources
+            by_resource = self._by_resource
+            for res, qty in released.items():
+                avail[res] += qty
+                by_resource[res].discard(order_id)
+            # Update DB allocations and the resources that changed
+            with self.db.transaction():
+                self.db.delete_allocations_for_order(order_id)
+                self._persist_resources(released)
 
-    def _can_allocate(self, request):
+    def feasible(self, requests):
+        """
+        Return the set of order_ids whose request fits the current
+        available resources.
+        requests: dict of order_id -> requested resources (dict)
         """
-        Check if requested resources can be allocated.
+        avail = self.available_resources
+        return {order_id for order_id, request in requests.items()
+                if all(avail.get(res, 0) >= qty for res, qty in request.items())}
+
+    def _try_allocate(self, order_id, request, *, take_ownership=False):
         """
-        for res, qty in request.items():
-            if self.available_resources.get(res, 0) < qty:
+        Allocate resources to an order if all of them are available.
+        take_ownership: store request itself instead of a copy; the caller
+        must not modify it afterwards.
+        Returns True if resources allocated, False otherwise.
+        """
+        avail = self.available_resources
+        items = request.items()
+        for res, qty in items:
+            if avail.get(res, 0) < qty:
                 return False
+        by_resource = self._by_resource
+        # The new request replaces whatever the order held before
+        for res in self.allocated_resources.get(order_id, ()):
+            by_resource[res].discard(order_id)
+        for res, qty in items:
+            avail[res] -= qty
+            if qty > 0:
+                by_resource[res].add(order_id)
+        self.allocated_resources[order_id] = request if take_ownership else dict(request)
+        # Update DB allocations and the resources that changed
+        with self.db.transaction():
+            self.db.upsert_allocations_many([(order_id, res, qty) for res, qty in request.items()])
+            self._persist_resources(request)
         return True
 
-    def _allocate(self, order_id, request):
-        """
-        Allocate resources to an order.
-        """
-        for res, qty in request.items():
-            self.available_resources[res] -= qty
-        self.allocated_resources[order_id] = request.copy()
-        # Update DB allocations and resources
-        for res, qty in request.items():
-            self.db.upsert_allocation(order_id, res, qty)
-        for res in self.total_resources:
-            self.db.upsert_resource(res, self.total_resources[res], self.available_resources[res])
+    def _persist_resources(self, names):
+        """
+        Write the current total/available counts of the given resources
+        to the DB in one batch.
+        """
+        total = self.total_resources
+        avail = self.available_resources
+        self.db.upsert_resources_many([(res, total[res], avail[res]) for res in names])
 
     def add_virtual_resources(self, additions):
         """
         Add virtual resources to the available and total resources.
         additions: dict of resource_name -> quantity
         """
-        for res, qty in additions.items():
+        changed = [sys.intern(res) for res, qty in additions.items() if qty != 0]
+        if not changed:
+            return
+        for res in changed:
+            qty = additions[res]
             self.total_resources[res] = self.total_resources.get(res, 0) + qty
             self.available_resources[res] = self.available_resources.get(res, 0) + qty
-            self.db.upsert_resource(res, self.total_resources[res], self.available_resources[res])
+        self._persist_resources(changed)
 
     def preempt_resources(self, order_id):
         """
         Preempt (forcefully release) resources held by an order.
         """
         if order_id in self.allocated_resources:
-            for res, qty in self.allocated_resources[order_id].items():
-                self.available_resources[res] += qty
-            del self.allocated_resources[order_id]
-            self.db.delete_allocations_for_order(order_id)
-            for res in self.total_resources:
-                self.db.upsert_resource(res, self.total_resources[res], self.available_resources[res])
+            released = self.allocated_resources.pop(order_id)
+            avail = self.available_resources
+            by_resource = self._by_resource
+            for res, qty in released.items():
+                avail[res] += qty
+                by_resource[res].discard(order_id)
+            with self.db.transaction():
+                self.db.delete_allocations_for_order(order_id)
+                self._persist_resources(released)
+
+    def reset(self):
+        """
+        Return all allocated resources to the available pool.
+        In memory only, like OrderManager.reset; the DB rows are left as is.
+        """
+        self.available_resources = self.total_resources.copy()
+        self.allocated_resources.clear()
+        self._by_resource.clear()
+
+    def holders_by_resource(self):
+        """
+        Return the live mapping of resource_name -> set of order_ids holding it.
+        Kept in sync by allocation and release; callers must not mutate it.
+        """
+        return self._by_resource
 
     def get_status(self):
         """